@@ -2,21 +2,31 @@
 
 import argparse
 import bz2
-import codecs
+import itertools
 import os
+import pickle
 import re
+import shutil
+import subprocess
 import sys
 import urllib.error
 import urllib.parse
 import urllib.request
 import zipfile
 from collections import Counter
+from functools import partial
+from multiprocessing import Pool
 
 from tqdm import tqdm
 from transliterate import translit
 from transliterate.base import TranslitLanguagePack, registry
 from transliterate.discover import autodiscover
 
+try:        # optional: pip install pybloomfiltermmap3
+    from pybloomfilter import BloomFilter
+except ImportError:
+    BloomFilter = None
+
 
 __author__  = "Igor Ivanov, @lctrcl"
 __license__ = "GPL"
@@ -56,18 +66,42 @@ class ReverseInverseRussianLanguagePack(TranslitLanguagePack):
 registry.register(ReverseInverseRussianLanguagePack)
 
 
+def _translation_table(language_code: str, reversed: bool = False) -> dict:
+    """Collapse a language pack into a single ``str.translate`` table.
+
+    Every rule of the packs used here rewrites one source character, so
+    running ``translit`` once per character gives the same result as calling
+    it on whole words – minus the per-call overhead.
+    """
+    pack = registry.registry[language_code]
+    if reversed:
+        source = pack.mapping[1] + "".join((pack.pre_processor_mapping or {}).values())
+        if pack.reversed_specific_mapping:
+            source += pack.reversed_specific_mapping[0]
+    else:
+        source = pack.mapping[0]
+    return str.maketrans(
+        {c: translit(c, language_code, reversed=reversed) for c in set(source)}
+    )
+
+
+GENDIC_TABLES = {
+    "translit":  _translation_table("ru", reversed=True),
+    "ru_inv_en": _translation_table("ru_inv_en"),
+}
+RU_INV_EN_REVERSED = _translation_table("ru_inv_en", reversed=True)
+
+
 # --------------------------------------------------------------------------- #
-# Helper for urllib reporting
+# Helper for native decompressors (bzip2/unzip are much faster than bz2/zipfile)
 # --------------------------------------------------------------------------- #
-def _reporthook(numblocks, blocksize, filesize, url=None):
-    base = os.path.basename(url)
-    try:
-        percent = min((numblocks * blocksize * 100) / filesize, 100)
-    except Exception:
-        percent = 100
-    if numblocks != 0:
-        sys.stdout.write("\b" * 70)
-        sys.stdout.write("%-66s%3d%%" % (base, percent))
+def _copy_from_command(cmd, dest):
+    """Stream the stdout of *cmd* into the file *dest*."""
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=1024 * 1024) as p, \
+         open(dest, "wb") as dst:
+        shutil.copyfileobj(p.stdout, dst, 1024 * 1024)
+    if p.returncode:
+        raise subprocess.CalledProcessError(p.returncode, cmd)
 
 
 # --------------------------------------------------------------------------- #
@@ -78,11 +112,13 @@ def downloaddictionaries(dictionary_strings: str):
 
     try:
         print(f"[*] Downloading {dictionary_strings} dictionary")
-        name, _ = urllib.request.urlretrieve(
-            url,
-            os.path.basename(url),
-            lambda nb, bs, fs, url=url: _reporthook(nb, bs, fs, url),
-        )
+        name = os.path.basename(url)
+        with urllib.request.urlopen(url) as resp, open(name, "wb") as fout:
+            total = int(resp.headers.get("content-length", 0)) or None
+            with tqdm(total=total, unit="B", unit_scale=True, desc=name) as pbar:
+                while chunk := resp.read(1024 * 1024):
+                    fout.write(chunk)
+                    pbar.update(len(chunk))
     except IOError as e:
         print(f"Can't retrieve {url!r}: {e}")
         return
@@ -96,24 +132,58 @@ def downloaddictionaries(dictionary_strings: str):
             print(f"Bad zipfile (from {url!r}): {e}")
             return
 
-        for n in z.namelist():
-            print(n)
-            dest = os.path.join("./", n)
-            destdir = os.path.dirname(dest)
-            if not os.path.isdir(destdir):
-                os.makedirs(destdir)
-            with open(dest, "wb") as f:
-                f.write(z.read(n))
-        z.close()
+        unzip = shutil.which("unzip")
+        with z:
+            for n in z.namelist():
+                print(n)
+                dest = os.path.join("./", n)
+                destdir = os.path.dirname(dest)
+                if not os.path.isdir(destdir):
+                    os.makedirs(destdir)
+                if unzip:
+                    try:
+                        _copy_from_command([unzip, "-p", name, n], dest)
+                        continue
+                    except subprocess.CalledProcessError as e:
+                        print(f"{unzip} failed ({e}), falling back to zipfile")
+                with z.open(n) as src, open(dest, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
         os.unlink(name)
 
     # -- opencorpora: .bz2 --------------------------------------------------- #
     elif dictionary_strings == "opencorpora":
         print(f"[*] Extracting {dictionary_strings} dictionary")
-        uncompresseddata = bz2.BZ2File(os.path.basename(url)).read()
         zname = os.path.splitext(os.path.basename(url))[0]
-        with open(zname, "wb") as f:
-            f.write(uncompresseddata)
+        bzip2 = shutil.which("lbzip2") or shutil.which("bzip2")
+        if bzip2:
+            try:
+                _copy_from_command([bzip2, "-dc", name], zname)
+                return
+            except subprocess.CalledProcessError as e:
+                print(f"{bzip2} failed ({e}), falling back to bz2")
+        with bz2.open(os.path.basename(url), "rb") as src, \
+             open(zname, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+# --------------------------------------------------------------------------- #
+# Cleaning patterns (compiled once, per corpus column)
+# --------------------------------------------------------------------------- #
+def _clean_pattern(column: int):
+    # Palavra na coluna `column`, com 4+ caracteres e sem latinos/dígitos/_ ;
+    # linhas vazias ou mal‑formadas simplesmente não casam.
+    # A classe da palavra só lista ASCII, então o SRE a compila num único
+    # bitmap de 256 bits; re.ASCII faz o mesmo com \s/\S das colunas.
+    return re.compile(
+        rf"^[^\S\n]*(?:\S+[^\S\n]+){{{column}}}([^\t\n\v\f\r a-zA-Z0-9_]{{4,}})(?!\S)",
+        re.MULTILINE | re.ASCII,
+    )
+
+
+CLEAN_PATTERNS = {
+    "opencorpora": _clean_pattern(0),   # palavra na 1.ª coluna
+    "ruscorpora":  _clean_pattern(1),   # palavra na 2.ª coluna
+}
 
 
 # --------------------------------------------------------------------------- #
@@ -127,78 +197,142 @@ def autoclean(dictionary_strings: str):
     # Arquivo‑fonte
     if dictionary_strings == "opencorpora":
         name = os.path.splitext(os.path.basename(dictionary_urls[dictionary_strings]))[0]
-        idx  = 0            # palavra na 1.ª coluna
     else:  # ruscorpora
         name = f"{os.path.splitext(os.path.basename(dictionary_urls[dictionary_strings]))[0]}.txt"
-        idx  = 1            # palavra na 2.ª coluna
 
-    regex = re.compile(r"[a-zA-Z0-9_]")      # remove latinos/dígitos/_
+    # o formato do corpus é fixo: coluna já embutida no padrão compilado
+    findall = CLEAN_PATTERNS[dictionary_strings].findall
 
     out_name = f"{dictionary_strings}_dict_stripped"
     kept = 0
+    seen = set()                             # formas repetidas saem uma vez só
+
+    with open(name, "r", encoding="utf-8", buffering=1024 * 1024) as fin, \
+         open(out_name, "w", encoding="utf-8", newline="\n",
+              buffering=1024 * 1024) as fout:
+
+        # blocos de ~1 MiB de linhas inteiras → uma chamada findall por bloco
+        while lines := fin.readlines(1024 * 1024):
+            # minúsculas + dedup sem laço Python por palavra
+            # (map, dict.fromkeys e filterfalse iteram em C)
+            words = dict.fromkeys(map(str.lower, findall("".join(lines))))
+            fresh = list(itertools.filterfalse(seen.__contains__, words))
+            seen.update(fresh)
+            fout.writelines(map("{}\n".format, fresh))
+            kept += len(fresh)
 
-    with codecs.open(name, "r", "utf-8") as fin, \
-         codecs.open(out_name, "w", "utf-8") as fout:
+    print(f"[*] Saved {kept} clean words to {out_name}")
 
-        for line in fin:
-            if not line.strip():             # ignora linhas vazias
-                continue
-            parts = line.split()
-            if len(parts) <= idx:            # ignora linhas mal‑formadas
-                continue
 
-            word = parts[idx]
-            if regex.search(word) or len(word) <= 3:
-                continue
+# --------------------------------------------------------------------------- #
+# Batching helpers (gendic worker pool, password counting)
+# --------------------------------------------------------------------------- #
+def _batched(iterable, n):
+    it = iter(iterable)
+    while batch := list(itertools.islice(it, n)):
+        yield batch
 
-            fout.write(word.lower() + "\n")
-            kept += 1
 
-    print(f"[*] Saved {kept} clean words to {out_name}")
+def _translate_batch(gendic, lines):
+    """Pool worker: transliterate raw *lines*, return (bytes read, encoded output)."""
+    table = GENDIC_TABLES[gendic]
+    raw = b"".join(lines)
+    text = "".join(f"{line.translate(table)}\n" for line in raw.decode("utf-8").splitlines())
+    return len(raw), text.encode("utf-8")
 
 
 # --------------------------------------------------------------------------- #
 # STEP 3 – generate derived dictionaries (translit, ru_inv_en, …)
 # --------------------------------------------------------------------------- #
 def generatedictionary(source: str, destination: str, gendic: str):
-    with codecs.open(source, "r", "utf-8") as f:
-        lines = f.read().splitlines()
-
     print(f"[*] Making {gendic} dictionary: ")
 
     if gendic == "tran5l1t":
         print("Not implemented yet")
         return
 
-    with codecs.open(destination, "a+", "utf-8") as myfile:
-        if gendic == "translit":
-            for line in tqdm(lines):
-                myfile.write(f"{translit(str(line), 'ru', reversed=True)}\n")
+    # The source is streamed as raw lines; decoding happens in the workers.
+    # Pool.imap would queue the whole file at once, so it is fed a bounded
+    # window of batches at a time.
+    worker = partial(_translate_batch, gendic)
+    with open(source, "rb", buffering=1024 * 1024) as f, \
+         open(destination, "ab", buffering=1024 * 1024) as myfile, \
+         Pool() as pool, \
+         tqdm(total=os.path.getsize(source), unit="B", unit_scale=True) as pbar:
+        for window in _batched(_batched(f, 10_000), 64):
+            for size, data in pool.imap(worker, window):
+                myfile.write(data)
+                pbar.update(size)
+
+
+# --------------------------------------------------------------------------- #
+# Helpers for the password comparison
+# --------------------------------------------------------------------------- #
+def _lines(path):
+    """Yield the lines of *path* as bytes, without the line ending."""
+    with open(path, "rb", buffering=1024 * 1024) as f:
+        for line in f:
+            yield line.rstrip(b"\r\n")
+
+
+def _count_lines(path):
+    with open(path, "rb") as f:
+        return sum(chunk.count(b"\n") for chunk in iter(partial(f.read, 1024 * 1024), b""))
 
-        elif gendic == "ru_inv_en":
-            for line in tqdm(lines):
-                myfile.write(f"{translit(str(line), gendic)}\n")
+
+def _index_name(dictionary: str) -> str:
+    return f"{dictionary}.idx"
+
+
+# --------------------------------------------------------------------------- #
+# STEP 3b – pickle a dictionary into an index for faster comparisons
+# --------------------------------------------------------------------------- #
+def build_index(dictionary: str):
+    print(f"[*] Building index for {dictionary}")
+    words = frozenset(_lines(dictionary))
+    with open(_index_name(dictionary), "wb") as f:
+        pickle.dump(words, f, protocol=5)
+    print(f"[*] Saved {len(words)} words to {_index_name(dictionary)}")
 
 
 # --------------------------------------------------------------------------- #
 # STEP 4 – compare with leaked password bases
 # --------------------------------------------------------------------------- #
 def compare_two_password_bases(source: str, destination: str, dictionary: str):
-    with codecs.open(source, "r", "utf-8") as f:
-        leaked_passwords = f.read().splitlines()
-
-    with codecs.open(dictionary, "r", "utf-8") as content_file:
-        translit_dictionary = content_file.read().splitlines()
+    # Both files are handled as raw bytes: no UTF‑8 decoding on the hot path,
+    # and the leaked dump is streamed instead of being loaded whole.
+    index = _index_name(dictionary)
+    use_bloom = False
+    if os.path.exists(index) and os.path.getmtime(index) >= os.path.getmtime(dictionary):
+        with open(index, "rb") as f:
+            s = pickle.load(f)
+    elif BloomFilter is None:
+        s = set(_lines(dictionary))
+    else:
+        use_bloom = True
+        # A Bloom filter takes a few bits per word instead of a full set entry;
+        # its rare false positives are dropped against the dictionary below.
+        s = BloomFilter(max(_count_lines(dictionary), 1), 1e-4)
+        s.update(_lines(dictionary))
 
     print("[*] Generating statistics: ")
-    s   = set(translit_dictionary)
-    b3  = [val for val in tqdm(leaked_passwords) if val in s]
-    cnt = Counter(b3)
+    cnt = Counter()
+    with tqdm(total=os.path.getsize(source), unit="B", unit_scale=True) as pbar:
+        for chunk in _batched(_lines(source), 1_000_000):
+            cnt.update(filter(s.__contains__, chunk))
+            pbar.update(sum(map(len, chunk)) + len(chunk))     # + line endings
+
+    if use_bloom:
+        found = set(filter(cnt.__contains__, _lines(dictionary)))
+        for k in cnt.keys() - found:
+            del cnt[k]
 
     print("[*] Writing to file: ")
-    with codecs.open(destination, "w+", "utf-8") as myfile:
+    with open(destination, "w", encoding="utf-8", newline="\n",
+              buffering=1024 * 1024) as myfile:
         for k, v in cnt.most_common():
-            myfile.write(f"{v} {k} {translit(k, 'ru_inv_en', reversed=True)}\n")
+            k = k.decode("utf-8")
+            myfile.write(f"{v} {k} {k.translate(RU_INV_EN_REVERSED)}\n")
 
     print("Done")
 
@@ -213,6 +347,7 @@ def main():
             "Usage examples:\n"
             "  python crwg.py --downloaddictionaries ruscorpora --autoclean\n"
             "  python crwg.py -g ru_inv_en -s source.txt -d dest.txt\n"
+            "  python crwg.py --build_index --dictionary opencorpora_dict_stripped_ru_inv_en\n"
             "  python crwg.py -c -s leaked.txt -d stats.txt --dictionary opencorpora_dict_stripped_ru_inv_en\n"
         ),
     )
@@ -235,6 +370,11 @@ def main():
     parser.add_argument("--source",      "-s", help="Source file")
     parser.add_argument("--destination", "-d", help="Destination file")
     parser.add_argument("--dictionary",          help="Dictionary file (for comparisons)")
+    parser.add_argument(
+        "--build_index",
+        action="store_true",
+        help="Pickle --dictionary into <dictionary>.idx, loaded by later -c runs",
+    )
     parser.add_argument(
         "--compare_two_password_bases", "-c",
         action="store_true",
@@ -262,6 +402,11 @@ def main():
             parser.error("--gendic requires --source and --destination")
         generatedictionary(args.source, args.destination, args.gendic)
 
+    if args.build_index:
+        if not args.dictionary:
+            parser.error("--build_index requires --dictionary")
+        build_index(args.dictionary)
+
     if args.compare_two_password_bases:
         if not (args.source and args.destination and args.dictionary):
             parser.error(